@@ -2,7 +2,8 @@
 # Env: DISCORD_TOKEN (required), GIVEAWAY_CHANNEL_ID (optional), TIMEZONE, DRAW_HOUR_LOCAL, WIN_COOLDOWN_DAYS
 # Run: python wish_bot.py
 
-import os, re, json, sqlite3, asyncio, random, urllib.parse, html
+import os, re, json, sqlite3, asyncio, random, urllib.parse, html, itertools, time, logging, hashlib, threading, contextlib, functools
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Tuple, List, Dict
 
@@ -24,6 +25,9 @@ DB_PATH = os.getenv("DB_PATH", "wish.db")
 PRODUCT_SAMPLE_LIMIT = int(os.getenv("PRODUCT_SAMPLE_LIMIT", "60"))
 PRODUCT_CONCURRENCY = int(os.getenv("PRODUCT_CONCURRENCY", "4"))
 PRODUCT_CACHE_TTL_HOURS = int(os.getenv("PRODUCT_CACHE_TTL_HOURS", "168"))
+HTML_MAX_BYTES = int(os.getenv("HTML_MAX_BYTES", "65536"))  # cap per scraped page
+HTTP_PER_HOST = int(os.getenv("HTTP_PER_HOST", "16"))  # open connections to imvu.com at once
+HTTP_429_RETRIES = int(os.getenv("HTTP_429_RETRIES", "3"))
 ONE_WIN_ONLY = os.getenv("ONE_WIN_ONLY", "1") == "1"  # 1 = lifetime one win; set to 0 to disable
 STRICT_SHOP_MATCH = os.getenv("STRICT_SHOP_MATCH", "1") == "1"  # 1 = no fallback when shops exist
 
@@ -38,16 +42,61 @@ INTENTS.message_content = True
 INTENTS.guilds = True
 INTENTS.members = True
 
-bot = commands.Bot(command_prefix="!", intents=INTENTS)
+discord.utils.setup_logging(level=logging.INFO)
+log = logging.getLogger("wish")
+
+try:
+    # lexbor backend: selectolax 1.x dropped selectolax.parser
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+    log.warning("selectolax not available; HTML parsing falls back to regex")
+
+class WishBot(commands.Bot):
+    async def close(self):
+        if HTTP_SESSION is not None and not HTTP_SESSION.closed:
+            await HTTP_SESSION.close()
+        await super().close()
+
+bot = WishBot(command_prefix="!", intents=INTENTS)
 tree = bot.tree
 
+# channels resolved via the API are remembered so repeat lookups skip fetch_channel
+CHANNEL_CACHE: Dict[int, discord.abc.Messageable] = {}
+
+async def resolve_channel(ch_id: int):
+    ch = CHANNEL_CACHE.get(ch_id) or bot.get_channel(ch_id)
+    if ch is None:
+        ch = await bot.fetch_channel(ch_id)
+    CHANNEL_CACHE[ch_id] = ch
+    return ch
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    CHANNEL_CACHE.pop(channel.id, None)
+
 # =========================
 # Database
 # =========================
+_DB_CONN: Optional[sqlite3.Connection] = None
+_DB_LOCK = threading.RLock()  # one transaction at a time on the shared connection, from any thread
+
+@contextlib.contextmanager
 def db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute("PRAGMA journal_mode=WAL;")
-    return conn
+    """`with db() as conn:` — the shared connection, locked; commits or rolls back, never closes."""
+    global _DB_CONN
+    with _DB_LOCK:
+        if _DB_CONN is None:
+            conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")  # WAL+NORMAL: fsync at checkpoint only, still crash-safe
+            conn.execute("PRAGMA wal_autocheckpoint=1000;")
+            conn.execute("PRAGMA temp_store=MEMORY;")
+            conn.execute("PRAGMA mmap_size=268435456;")  # read pages straight from the OS cache
+            conn.execute("PRAGMA cache_size=-65536;")  # up to ~64 MB page cache for the long-lived connection
+            _DB_CONN = conn
+        with _DB_CONN:
+            yield _DB_CONN
 
 def init_db():
     with db() as conn:
@@ -83,12 +132,18 @@ def init_db():
           channel_id TEXT NOT NULL,
           message_id TEXT,
           prize TEXT NOT NULL,
-          description TEXT,
+          description TEXT,            -- shops JSON blob; write-only, keep out of scan queries
           winners INTEGER NOT NULL,
           end_at TEXT NOT NULL,
           created_by TEXT NOT NULL,
-          status TEXT DEFAULT 'OPEN'
+          status TEXT DEFAULT 'OPEN',
+          prize_html TEXT
         );""")
+        # older DBs: prize_html holds format_prize_text(prize), computed once at insert
+        try:
+            conn.execute("ALTER TABLE giveaways ADD COLUMN prize_html TEXT;")
+        except sqlite3.OperationalError:
+            pass
         conn.execute("""
         CREATE TABLE IF NOT EXISTS giveaway_winners(
           giveaway_id INTEGER NOT NULL,
@@ -105,6 +160,9 @@ def init_db():
           created_at TEXT NOT NULL,
           PRIMARY KEY (giveaway_id, discord_id)
         );""")
+        # watcher sweep filters on status + end_at; entries/winners are covered by their PKs
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_ga_status_end ON giveaways(status, end_at);")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_ga_message ON giveaways(message_id);")
         for k, v in [("mode","NONE"), ("threshold","10"), ("min_total","10"), ("map_json","{}")]:
             conn.execute("INSERT OR IGNORE INTO rules(key,value) VALUES(?,?)", (k, v))
 
@@ -120,63 +178,127 @@ def ensure_db():
     DB_INITIALISED = True
 
 
+# rules rarely change and only through set_rule, so keep the table in memory
+_RULES_CACHE: Dict[str, str] = {}
+_RULES_LOADED = False
+_RULES_LOCK = threading.Lock()
+
 def set_rule(key: str, value: str):
     with db() as conn:
         conn.execute(
             "INSERT INTO rules(key,value) VALUES(?,?) "
             "ON CONFLICT(key) DO UPDATE SET value=excluded.value;", (key, value)
         )
+    with _RULES_LOCK:
+        if _RULES_LOADED:
+            _RULES_CACHE[key] = value
+    _RULES_PARSED.pop(key, None)
+
+def _load_rules():
+    global _RULES_LOADED
+    with _RULES_LOCK:
+        if _RULES_LOADED:
+            return
+        with db() as conn:
+            cur = conn.execute("SELECT key,value FROM rules;")
+            _RULES_CACHE.update(cur.fetchall())
+        _RULES_LOADED = True
 
 def get_rules() -> Dict[str,str]:
-    with db() as conn:
-        cur = conn.execute("SELECT key,value FROM rules;")
-        return {k:v for k,v in cur.fetchall()}
+    _load_rules()
+    return dict(_RULES_CACHE)
+
+def get_rule(key: str, default: Optional[str] = None) -> Optional[str]:
+    _load_rules()
+    return _RULES_CACHE.get(key, default)
+
+# creators rows as list_creators() returns them; None until read, reset by every write
+_CREATORS_CACHE: Optional[List[tuple]] = None
 
 def add_creator(creator_id: str, label: Optional[str] = None):
+    global _CREATORS_CACHE
     with db() as conn:
         conn.execute(
             "INSERT INTO creators(creator_id,label) VALUES(?,?) "
             "ON CONFLICT(creator_id) DO UPDATE SET label=excluded.label;",
             (creator_id, label)
         )
+    _CREATORS_CACHE = None
 
-def list_creators() -> List[tuple]:
+def add_creators(rows: List[tuple]):
+    """Upsert many (creator_id, label) pairs in one statement."""
+    global _CREATORS_CACHE
+    if not rows:
+        return
     with db() as conn:
-        cur = conn.execute("SELECT creator_id,label FROM creators ORDER BY creator_id;")
-        return cur.fetchall()
+        conn.executemany(
+            "INSERT INTO creators(creator_id,label) VALUES(?,?) "
+            "ON CONFLICT(creator_id) DO UPDATE SET label=excluded.label;",
+            rows
+        )
+    _CREATORS_CACHE = None
 
-def upsert_entrant(discord_id: int, username: str, total_items: int, eligible: int):
-    now = datetime.now(timezone.utc).isoformat()
-    with db() as conn:
-        conn.execute("""
+def list_creators() -> List[tuple]:
+    global _CREATORS_CACHE
+    if _CREATORS_CACHE is None:
+        with db() as conn:
+            cur = conn.execute("SELECT creator_id,label FROM creators ORDER BY creator_id;")
+            _CREATORS_CACHE = cur.fetchall()
+    return list(_CREATORS_CACHE)
+
+UPSERT_ENTRANT_SQL = """
         INSERT INTO Participants(discord_id, username, created_at, last_checked_at, total_items, eligible)
-        VALUES(?,?,?,?,?,?)
+        VALUES(?,?,datetime('now'),datetime('now'),?,?)
         ON CONFLICT(discord_id) DO UPDATE SET
           username=excluded.username, last_checked_at=excluded.last_checked_at,
           total_items=excluded.total_items, eligible=excluded.eligible
-        """, (str(discord_id), username, now, now, total_items, eligible))
+        """
+
+def upsert_entrant(discord_id: int, username: str, total_items: int, eligible: int):
+    with db() as conn:
+        conn.execute(UPSERT_ENTRANT_SQL, (str(discord_id), username, total_items, eligible))
 
 def all_Participants():
+    # unused in-tree; projection left as-is (already skips created_at/last_checked_at)
+    # since there is no caller to narrow it for
     with db() as conn:
         cur = conn.execute("SELECT discord_id, username, total_items, eligible, last_win_at FROM Participants;")
         return cur.fetchall()
 
 def set_winner(discord_id: int):
     with db() as conn:
-        conn.execute("UPDATE Participants SET last_win_at=? WHERE discord_id=?",
-                     (datetime.now(timezone.utc).isoformat(), str(discord_id)))
+        conn.execute("UPDATE Participants SET last_win_at=datetime('now') WHERE discord_id=?",
+                     (str(discord_id),))
 
 def giveaway_insert(channel_id: int, prize: str, desc: str, winners: int, end_at_iso: str, created_by: int) -> int:
     with db() as conn:
         cur = conn.execute("""
-          INSERT INTO giveaways(channel_id, message_id, prize, description, winners, end_at, created_by, status)
-          VALUES(?,?,?,?,?,?,?, 'OPEN');
-        """, (str(channel_id), "", prize, desc, winners, end_at_iso, str(created_by)))
+          INSERT INTO giveaways(channel_id, message_id, prize, description, winners, end_at, created_by, status, prize_html)
+          VALUES(?,?,?,?,?,?,?, 'OPEN', ?);
+        """, (str(channel_id), "", prize, desc, winners, end_at_iso, str(created_by), format_prize_text(prize)))
         return cur.lastrowid
 
+# message_id -> giveaway id, so button clicks route without a DB query
+MESSAGE_GIDS: Dict[int, int] = {}
+
 def giveaway_set_message(gid: int, message_id: int):
     with db() as conn:
         conn.execute("UPDATE giveaways SET message_id=? WHERE id=?", (str(message_id), gid))
+    MESSAGE_GIDS[int(message_id)] = gid
+
+def giveaway_id_for_message(message_id: int) -> Optional[int]:
+    gid = MESSAGE_GIDS.get(message_id)
+    if gid is not None:
+        return gid
+    ensure_db()
+    with db() as conn:
+        row = conn.execute(
+            "SELECT id FROM giveaways WHERE message_id=? ORDER BY id DESC LIMIT 1", (str(message_id),)
+        ).fetchone()
+    if not row:
+        return None
+    MESSAGE_GIDS[message_id] = int(row[0])
+    return int(row[0])
 
 def giveaway_mark_done(gid: int):
     with db() as conn:
@@ -187,15 +309,16 @@ def set_giveaway_shops(gid: int, cids: List[str]):
     set_rule(f"shops:{gid}", ",".join([str(x) for x in cids]))
 
 def get_giveaway_shops(gid: int) -> List[str]:
-    r = get_rules().get(f"shops:{gid}", "")
+    r = get_rule(f"shops:{gid}", "")
     return [x for x in r.split(",") if x]
 
 # ---- New: explicit helpers to avoid name collision & prefer rules ----
 def get_giveaway_shops_from_rules(gid: int) -> List[str]:
-    r = get_rules().get(f"shops:{gid}", "")
+    r = get_rule(f"shops:{gid}", "")
     return [x for x in r.split(",") if x]
 
 SHOP_LINK_RX = re.compile(r'manufacturers_id=(\d+)')
+BARE_ID_RX = re.compile(r'\b(\d{5,})\b')
 
 async def get_giveaway_shops_from_embed(gid: int) -> List[str]:
     """Read the giveaway message embed and extract manufacturers_id values."""
@@ -205,7 +328,7 @@ async def get_giveaway_shops_from_embed(gid: int) -> List[str]:
         return []
     ch_id, msg_id = int(row[0]), int(row[1])
 
-    channel = bot.get_channel(ch_id) or await bot.fetch_channel(ch_id)
+    channel = await resolve_channel(ch_id)
     try:
         msg = await channel.fetch_message(msg_id)
     except Exception:
@@ -218,7 +341,7 @@ async def get_giveaway_shops_from_embed(gid: int) -> List[str]:
     ids = SHOP_LINK_RX.findall(desc)
     # fallback: if someone pasted bare CIDs in text
     if not ids:
-        ids = re.findall(r'\b(\d{5,})\b', desc)
+        ids = BARE_ID_RX.findall(desc)
     # uniq, keep order
     return list(dict.fromkeys(ids))
 
@@ -227,7 +350,10 @@ async def resolve_giveaway_shops(gid: int) -> List[str]:
     ids = get_giveaway_shops_from_rules(gid)
     if ids:
         return ids
-    return await get_giveaway_shops_from_embed(gid)
+    ids = await get_giveaway_shops_from_embed(gid)
+    if ids:
+        set_giveaway_shops(gid, ids)  # shops never change after posting; later calls hit the rules cache
+    return ids
 
 def giveaway_add_entry(gid: int, discord_id: int, uname: str, pid: str):
     with db() as conn:
@@ -236,6 +362,25 @@ def giveaway_add_entry(gid: int, discord_id: int, uname: str, pid: str):
           VALUES(?,?,?,?, datetime('now'))
         """, (gid, str(discord_id), uname, pid))
 
+def giveaway_save_entry(gid: int, discord_id: int, uname: str, pids_csv: str) -> bool:
+    """Insert or edit a user's entry and refresh their Participants row in one commit.
+    Returns True when an existing entry was edited."""
+    uid = str(discord_id)
+    with db() as conn:
+        # new entries take one statement; rowcount 0 means the row exists, so edit it
+        existed = conn.execute("""
+          INSERT INTO giveaway_entries(giveaway_id, discord_id, imvu_username, wishlist_product_id, created_at)
+          VALUES(?,?,?,?, datetime('now'))
+          ON CONFLICT(giveaway_id, discord_id) DO NOTHING
+        """, (gid, uid, uname, pids_csv)).rowcount == 0
+        if existed:
+            conn.execute("""
+              UPDATE giveaway_entries SET imvu_username=?, wishlist_product_id=?, created_at=datetime('now')
+              WHERE giveaway_id=? AND discord_id=?
+            """, (uname, pids_csv, gid, uid))
+        conn.execute(UPSERT_ENTRANT_SQL, (uid, uname, 0, 1))
+    return existed
+
 def giveaway_count_entries(gid: int) -> int:
     with db() as conn:
         cur = conn.execute("SELECT COUNT(*) FROM giveaway_entries WHERE giveaway_id=?", (gid,))
@@ -251,10 +396,14 @@ async def auto_adopt_open_posts():
     if not GIVEAWAY_CHANNEL_ID:
         return  # we need a channel to look in
 
-    ch = bot.get_channel(GIVEAWAY_CHANNEL_ID) or await bot.fetch_channel(GIVEAWAY_CHANNEL_ID)
+    ch = await resolve_channel(GIVEAWAY_CHANNEL_ID)
     if not ch:
         return
 
+    # every message the DB already tracks, in one query instead of one per scanned post
+    with db() as conn:
+        known = {r[0] for r in conn.execute("SELECT message_id FROM giveaways WHERE message_id != ''")}
+
     async for msg in ch.history(limit=50, oldest_first=False):
         # Only messages from this bot with our embed title
         if msg.author.id != bot.user.id or not msg.embeds:
@@ -264,9 +413,7 @@ async def auto_adopt_open_posts():
             continue
 
         # If DB already knows this message, skip
-        with db() as conn:
-            row = conn.execute("SELECT id FROM giveaways WHERE message_id=?", (str(msg.id),)).fetchone()
-        if row:
+        if str(msg.id) in known:
             continue
 
         # Parse bits from the embed description
@@ -291,23 +438,22 @@ async def auto_adopt_open_posts():
                 break
 
         # 4) shops (IDs from desc)
-        shop_ids = SHOPS_IN_DESC_RX.findall(desc) or re.findall(r"\b(\d{5,})\b", desc)
+        shop_ids = SHOPS_IN_DESC_RX.findall(desc) or BARE_ID_RX.findall(desc)
         shop_ids = list(dict.fromkeys(shop_ids))
 
         # Insert row + link to message
         gid = giveaway_insert(ch.id, prize, json.dumps({"shops": shop_ids}), winners_n, end_at_utc.isoformat(), bot.user.id)
         giveaway_set_message(gid, msg.id)
         set_giveaway_shops(gid, shop_ids)
+        schedule_draw(gid, end_at_utc)
 
         # Reattach the button
-        view = EnterButton(gid, disabled=False, timeout=None)
         try:
-            await msg.edit(view=view)
+            await msg.edit(view=EnterButton())
         except Exception:
             pass
-        bot.add_view(view)
 
-        print(f"[wish] auto-adopted message {msg.id} as giveaway #{gid}")
+        log.info("auto-adopted message %s as giveaway #%s", msg.id, gid)
         break  # adopt the first match only
 
 
@@ -316,7 +462,62 @@ def giveaway_entry_user_ids(gid: int) -> List[int]:
     with db() as conn:
         cur = conn.execute("SELECT DISTINCT discord_id FROM giveaway_entries WHERE giveaway_id=?", (gid,))
         return [int(r[0]) for r in cur.fetchall()]
+
+def giveaway_reroll_pool(gid: int) -> List[int]:
+    """Entrants of a giveaway who haven't already won it."""
+    with db() as conn:
+        cur = conn.execute(
+            "SELECT discord_id FROM giveaway_entries WHERE giveaway_id=? "
+            "EXCEPT SELECT discord_id FROM giveaway_winners WHERE giveaway_id=?",
+            (gid, gid)
+        )
+        return [int(r[0]) for r in cur.fetchall()]
         
+def pick_k(seq, k: int) -> list:
+    """k uniform random picks without replacement; random.sample does O(k) work for k << n."""
+    return random.sample(seq, min(k, len(seq)))
+
+SQL_MAX_VARS = 900  # stay under SQLite's default 999 bound-parameter limit
+
+def _select_in(sql: str, ids: List[str], params: tuple = ()) -> List[tuple]:
+    """Run `sql` (with an {ids} placeholder for the IN list) over ids in chunks."""
+    out: List[tuple] = []
+    with db() as conn:
+        for i in range(0, len(ids), SQL_MAX_VARS):
+            chunk = ids[i:i + SQL_MAX_VARS]
+            cur = conn.execute(sql.format(ids=",".join("?" * len(chunk))), (*params, *chunk))
+            out.extend(cur.fetchall())
+    return out
+
+def fetch_last_win_map(uids: List[int]) -> Dict[int, Optional[str]]:
+    """last_win_at for every known uid."""
+    rows = _select_in(
+        "SELECT discord_id, last_win_at FROM Participants WHERE discord_id IN ({ids})",
+        [str(u) for u in uids]
+    )
+    return {int(d): lw for d, lw in rows}
+
+def giveaway_entry_usernames(gid: int, uids: List[int]) -> Dict[int, str]:
+    """IMVU usernames the given users entered with, in one query."""
+    rows = _select_in(
+        "SELECT discord_id, imvu_username FROM giveaway_entries WHERE giveaway_id=? AND discord_id IN ({ids})",
+        [str(u) for u in uids], (gid,)
+    )
+    return {int(d): (u or "").strip() for d, u in rows if u and u.strip()}
+
+def giveaway_entry_product_ids(gid: int, uids: List[int]) -> Dict[int, str]:
+    """First submitted product ID per user, in one query."""
+    rows = _select_in(
+        "SELECT discord_id, wishlist_product_id FROM giveaway_entries WHERE giveaway_id=? AND discord_id IN ({ids})",
+        [str(u) for u in uids], (gid,)
+    )
+    out: Dict[int, str] = {}
+    for d, raw in rows:
+        pid = first_product_id(raw)
+        if pid:
+            out[int(d)] = pid
+    return out
+
 def add_giveaway_winner(gid: int, discord_id: int):
     with db() as conn:
         conn.execute(
@@ -324,14 +525,32 @@ def add_giveaway_winner(gid: int, discord_id: int):
             (gid, str(discord_id))
         )
 
+def record_giveaway_winners(gid: int, uids: List[int], done: bool = False):
+    """Stamp last_win_at and log winners in one transaction; optionally close the giveaway."""
+    rows = [(str(u),) for u in uids]
+    with db() as conn:
+        conn.executemany("UPDATE Participants SET last_win_at=datetime('now') WHERE discord_id=?", rows)
+        conn.executemany(
+            "INSERT OR IGNORE INTO giveaway_winners(giveaway_id, discord_id, created_at) VALUES(?,?,datetime('now'))",
+            [(gid, r[0]) for r in rows]
+        )
+        if done:
+            conn.execute("UPDATE giveaways SET status='DONE' WHERE id=?", (gid,))
+
 def list_giveaway_winners(gid: int) -> List[int]:
     with db() as conn:
         cur = conn.execute("SELECT discord_id FROM giveaway_winners WHERE giveaway_id=?", (gid,))
         return [int(r[0]) for r in cur.fetchall()]
 
+_UNAME_SAFE_RX = re.compile(r"[^A-Za-z0-9_.-]")
+# ASCII chars to drop, for the str.translate fast path
+_UNAME_DROP = dict.fromkeys(
+    (i for i in range(128) if not (chr(i).isalnum() or chr(i) in "_.-")), None
+)
+
 def imvu_profile_link(username: str) -> str:
     u = (username or "").strip()
-    u_safe = re.sub(r"[^A-Za-z0-9_.-]", "", u)
+    u_safe = u.translate(_UNAME_DROP) if u.isascii() else _UNAME_SAFE_RX.sub("", u)
     return f"https://go.imvu.com/av/{u_safe}"
     
 def purge_bad_cache_rows():
@@ -354,71 +573,263 @@ WISHLIST_CANDIDATES = [
     "https://www.imvu.com/catalog/web_wishlist.php?user={username}",
     "https://www.imvu.com/people/{username}/wishlist/",
 ]
+
+# One pooled session for IMVU scraping (keeps TCP/TLS connections alive between calls).
+# Created lazily so it binds to the running loop; closed in WishBot.close.
+HTTP_SESSION: Optional[aiohttp.ClientSession] = None
+
+def http_session() -> aiohttp.ClientSession:
+    global HTTP_SESSION
+    if HTTP_SESSION is None or HTTP_SESSION.closed:
+        HTTP_SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=64, limit_per_host=HTTP_PER_HOST, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=25, connect=10), headers=DEFAULT_HEADERS
+        )
+    return HTTP_SESSION
+
+# per-request timeout for the lighter name/image lookups
+SHORT_TIMEOUT = aiohttp.ClientTimeout(total=12, connect=8)
+
 PRODUCT_LINK_RX = re.compile(r'/shop/product(?:\.php\?products_id=|/)(\d+)', re.I)
-MANUFACTURER_RX = re.compile(r'manufacturers?_id(?:=|["\': ]*)(\d+)', re.I)
+MANUFACTURER_RX = re.compile(rb'manufacturers?_id(?:=|["\': ]*)(\d+)', re.I)  # bytes: scanned undecoded
+MANUFACTURER_HREF_RX = re.compile(rb'manufacturers_id=(\d+)')
+
+def _manufacturer_id(body: bytes) -> Optional[str]:
+    """First MANUFACTURER_RX match in the body, as before; the bytes.find hit on the literal
+    "manufacturers_id=" href only bounds the regex scan to the text ahead of it."""
+    idx = body.find(b"manufacturers_id=")
+    m = None
+    if idx >= 0:
+        m = MANUFACTURER_RX.search(body, 0, idx) or MANUFACTURER_HREF_RX.match(body, idx)
+    m = m or MANUFACTURER_RX.search(body)
+    return m.group(1).decode("ascii") if m else None
+
+def _anchor_hrefs(html: str, selector: str) -> List[str]:
+    """Pull href values with the C parser; empty when selectolax isn't installed."""
+    if HTMLParser is None:
+        return []
+    return [n.attributes.get("href") or "" for n in HTMLParser(html).css(selector)]
 
 def _product_ids_from_html(html: str) -> List[str]:
-    ids = [m.group(1) for m in PRODUCT_LINK_RX.finditer(html)]
-    seen, out = set(), []
-    for pid in ids:
-        if pid not in seen:
-            seen.add(pid); out.append(pid)
-    return out
+    # anchor hrefs come first (PRODUCT_LINK_RX is case-insensitive, so it does the
+    # filtering); the whole-page scan still adds IDs found outside anchors
+    hrefs = _anchor_hrefs(html, "a[href]")
+    ids = dict.fromkeys(m.group(1) for h in hrefs for m in PRODUCT_LINK_RX.finditer(h))
+    ids.update(dict.fromkeys(m.group(1) for m in PRODUCT_LINK_RX.finditer(html)))
+    return list(ids)
+
+STOP_TAIL = 512  # bytes kept after a stop_at marker, enough for the tag it opens
+
+async def _fetch_raw(url: str, session: aiohttp.ClientSession, min_len=3000,
+                     timeout: Optional[aiohttp.ClientTimeout] = None,
+                     stop_at: Optional[bytes] = None) -> Optional[Tuple[bytes, Optional[str]]]:
+    """(body, charset) for a 200 response, or None. 429s are retried with backoff.
+    With stop_at, reading ends STOP_TAIL bytes past the first occurrence of that marker."""
+    kw = {"timeout": timeout} if timeout else {}
+    for attempt in range(HTTP_429_RETRIES + 1):
+        try:
+            async with session.get(url, allow_redirects=True, **kw) as r:
+                if r.status == 429 and attempt < HTTP_429_RETRIES:
+                    ra = r.headers.get("Retry-After", "")
+                    delay = min(30, int(ra) if ra.isdigit() else 2 ** attempt)
+                elif r.status != 200:
+                    return None
+                else:
+                    # read at most HTML_MAX_BYTES instead of buffering the whole page
+                    raw = bytearray()
+                    hit = -1
+                    while len(raw) < HTML_MAX_BYTES:
+                        chunk = await r.content.read(HTML_MAX_BYTES - len(raw))
+                        if not chunk:
+                            break
+                        start = max(0, len(raw) - len(stop_at or b""))
+                        raw += chunk
+                        if stop_at and hit < 0:
+                            hit = raw.find(stop_at, start)
+                        if hit >= 0 and len(raw) - hit >= STOP_TAIL and len(raw) >= min_len:
+                            break
+                    if len(raw) < min_len:
+                        return None
+                    return (bytes(raw), r.charset)
+        except Exception:
+            return None
+        await asyncio.sleep(delay)
+    return None
 
-async def _fetch_html(url: str, session: aiohttp.ClientSession, min_len=3000) -> Optional[str]:
-    try:
-        async with session.get(url, allow_redirects=True) as r:
-            if r.status != 200:
-                return None
-            t = await r.text(errors="ignore")
-            if len(t) < min_len:
-                return None
-            return t
-    except Exception:
+async def _fetch_html(url: str, session: aiohttp.ClientSession, min_len=3000,
+                      timeout: Optional[aiohttp.ClientTimeout] = None) -> Optional[str]:
+    got = await _fetch_raw(url, session, min_len, timeout)
+    if not got:
         return None
+    try:
+        return got[0].decode(got[1] or "utf-8", errors="ignore")
+    except LookupError:  # bogus charset= in Content-Type
+        return got[0].decode("utf-8", errors="ignore")
+
+WISH_WORD_RX = re.compile(r'wish', re.I)
+WISH_HREF_RX = re.compile(r'href=["\']([^"\']*wish[^"\']*)["\']', re.I)
 
 def _extract_wishlist_links_from_profile(html: str) -> List[str]:
+    # no "wish" anywhere -> no wishlist links; skip the parse and href scan
+    if not WISH_WORD_RX.search(html):
+        return []
     out = []
-    for m in re.finditer(r'href=["\']([^"\']+)["\']', html, re.I):
-        href = m.group(1)
-        if "wish" not in href.lower():
-            continue
+    hrefs = _anchor_hrefs(html, "a[href]")
+    # filter inside the regex engine; no per-href .lower() copy
+    hrefs = [h for h in hrefs if WISH_WORD_RX.search(h)] if hrefs else WISH_HREF_RX.findall(html)
+    for href in hrefs:
         if href.startswith("//"): href = "https:" + href
         if href.startswith("/"):  href = "https://www.imvu.com" + href
         if "imvu.com" in href:
             out.append(href)
-    seen, res = set(), []
-    for u in out:
-        if u not in seen: seen.add(u); res.append(u)
-    return res
-
-async def product_creator_id(session: aiohttp.ClientSession, product_id: str, sem: asyncio.Semaphore) -> Optional[str]:
+    return list(dict.fromkeys(out))
+
+async def _probe_wishlist(url: str, session: aiohttp.ClientSession, via_profile: bool) -> Tuple[Optional[str], List[str]]:
+    """Fetch one candidate; profiles are followed to their wishlist links."""
+    page = await _fetch_html(url, session)
+    if not page:
+        return (None, [])
+    if not via_profile:
+        return (url, await asyncio.to_thread(_product_ids_from_html, page))
+    for wl in _extract_wishlist_links_from_profile(page):
+        wl_page = await _fetch_html(wl, session)
+        pids = await asyncio.to_thread(_product_ids_from_html, wl_page) if wl_page else []
+        if pids:
+            return (wl, pids)
+    return (None, [])
+
+async def wishlist_url_and_products(username: str) -> Tuple[Optional[str], List[str]]:
+    """Probe every wishlist/profile URL form at once; first one with products wins."""
+    u = urllib.parse.quote(username)
+    s = http_session()
+    probes = [asyncio.ensure_future(_probe_wishlist(t.format(username=u), s, False)) for t in WISHLIST_CANDIDATES]
+    probes += [asyncio.ensure_future(_probe_wishlist(t.format(username=u), s, True)) for t in PROFILE_CANDIDATES]
+    try:
+        for fut in asyncio.as_completed(probes):
+            try:
+                wl_url, pids = await fut
+            except Exception:
+                continue
+            if pids:
+                return (wl_url, pids[:PRODUCT_SAMPLE_LIMIT])
+    finally:
+        for t in probes:
+            t.cancel()
+    return (None, [])
+
+class Admission:
+    """Semaphore-like limiter (`async with`) whose cap can be changed while in use."""
+    def __init__(self, cap: int):
+        self.cap = max(1, cap)
+        self._n = 0
+        self._cv = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cv:
+            await self._cv.wait_for(lambda: self._n < self.cap)
+            self._n += 1
+
+    async def __aexit__(self, *exc):
+        async with self._cv:
+            self._n -= 1
+            self._cv.notify(1)
+
+    async def resize(self, cap: int):
+        async with self._cv:
+            self.cap = max(1, cap)
+            self._cv.notify_all()
+
+# Shared across evaluations and draws so concurrent work respects one request budget.
+# Created lazily so it binds to the running loop; /concurrency resizes it live.
+PRODUCT_SEM: Optional[Admission] = None
+
+def product_sem() -> Admission:
+    global PRODUCT_SEM
+    if PRODUCT_SEM is None:
+        PRODUCT_SEM = Admission(int(get_rule("concurrency", str(PRODUCT_CONCURRENCY))))
+    return PRODUCT_SEM
+
+async def product_creator_id(session: aiohttp.ClientSession, product_id: str, sem: Admission) -> Optional[str]:
     cached = cache_get(product_id)
     # If cache has a real creator_id, use it. If it's "", treat as a miss and retry.
     if cached is not None and cached != "":
         return cached
-
+    cid = await _scrape_product_creator(session, product_id, sem)
+    if cid:
+        cache_put(product_id, cid)   # cache only on success
+    # do NOT cache failures
+    return cid
+
+# product_id -> [fetch task, waiter count]; concurrent lookups of one product share a fetch
+_INFLIGHT: Dict[str, list] = {}
+
+async def _scrape_product_creator(session: aiohttp.ClientSession, product_id: str, sem: Admission) -> Optional[str]:
+    """Network half of product_creator_id; callers handle the cache."""
+    entry = _INFLIGHT.get(product_id)
+    if entry is None:
+        entry = _INFLIGHT[product_id] = [asyncio.ensure_future(_fetch_product_creator(session, product_id, sem)), 0]
+        entry[0].add_done_callback(lambda _t: _INFLIGHT.pop(product_id, None) if _INFLIGHT.get(product_id) is entry else None)
+    entry[1] += 1
+    try:
+        # shield: one waiter being cancelled must not cancel the fetch for the others
+        return await asyncio.shield(entry[0])
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0 and not entry[0].done():
+            # last waiter gone (e.g. evaluate_user stopped early): drop the fetch too
+            if _INFLIGHT.get(product_id) is entry:
+                del _INFLIGHT[product_id]
+            entry[0].cancel()
+
+async def _fetch_product_creator(session: aiohttp.ClientSession, product_id: str, sem: Admission) -> Optional[str]:
     urls = [
         f"https://www.imvu.com/shop/product/{product_id}",
         f"https://www.imvu.com/shop/product.php?products_id={product_id}",
     ]
     async with sem:
         for url in urls:
-            htmlp = await _fetch_html(url, session)
-            if not htmlp:
+            got = await _fetch_raw(url, session, stop_at=b"manufacturers_id=")
+            if not got:
                 continue
-            m = MANUFACTURER_RX.search(htmlp)
-            if m:
-                cid = m.group(1)
-                cache_put(product_id, cid)   # cache only on success
+            # the ID is ASCII digits, so scan the bytes and skip decoding the page
+            cid = _manufacturer_id(got[0])
+            if cid:
                 return cid
-    # do NOT cache failures
     return None
 
 
+# In-memory LRU over cache_products: product_id -> (creator_id, expires monotonic)
+MEM_CACHE: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+MEM_CACHE_MAX = 10000
+
+def _mem_cache_set(product_id: str, creator_id: str, ttl_secs: float):
+    MEM_CACHE[product_id] = (creator_id, time.monotonic() + ttl_secs)
+    MEM_CACHE.move_to_end(product_id)
+    if len(MEM_CACHE) > MEM_CACHE_MAX:
+        MEM_CACHE.popitem(last=False)  # least recently used
+
+def _mem_cache_get(product_id: str, now: float) -> Optional[str]:
+    hit = MEM_CACHE.get(product_id)
+    if not hit:
+        return None
+    if hit[1] <= now:
+        del MEM_CACHE[product_id]
+        return None
+    MEM_CACHE.move_to_end(product_id)
+    return hit[0]
+
+CACHE_GET_SQL = "SELECT creator_id, fetched_at FROM cache_products WHERE product_id=?"
+CACHE_PUT_SQL = (
+    "INSERT INTO cache_products(product_id,creator_id,fetched_at) VALUES(?,?,datetime('now')) "
+    "ON CONFLICT(product_id) DO UPDATE SET creator_id=excluded.creator_id, fetched_at=excluded.fetched_at;"
+)
+
 def cache_get(product_id: str) -> Optional[str]:
+    hit = _mem_cache_get(product_id, time.monotonic())
+    if hit:
+        return hit
     with db() as conn:
-        cur = conn.execute("SELECT creator_id, fetched_at FROM cache_products WHERE product_id=?", (product_id,))
+        cur = conn.execute(CACHE_GET_SQL, (product_id,))
         row = cur.fetchone()
     if not row: return None
     creator_id, fetched_at = row
@@ -426,33 +837,104 @@ def cache_get(product_id: str) -> Optional[str]:
         ts = datetime.fromisoformat(fetched_at.replace("Z","")).replace(tzinfo=timezone.utc)
     except Exception:
         ts = datetime.now(timezone.utc) - timedelta(days=9999)
-    if datetime.now(timezone.utc) - ts > timedelta(hours=PRODUCT_CACHE_TTL_HOURS):
+    remaining = timedelta(hours=PRODUCT_CACHE_TTL_HOURS) - (datetime.now(timezone.utc) - ts)
+    if remaining.total_seconds() <= 0:
         return None
+    if creator_id:
+        _mem_cache_set(product_id, creator_id, remaining.total_seconds())
     return creator_id
 
 def cache_put(product_id: str, creator_id: Optional[str]):
     # Skip caching failures/empties
     if not creator_id:
         return
+    _mem_cache_set(product_id, creator_id, PRODUCT_CACHE_TTL_HOURS * 3600)
     with db() as conn:
-        conn.execute(
-            "INSERT INTO cache_products(product_id,creator_id,fetched_at) VALUES(?,?,?) "
-            "ON CONFLICT(product_id) DO UPDATE SET creator_id=excluded.creator_id, fetched_at=excluded.fetched_at;",
-            (product_id, creator_id, datetime.now(timezone.utc).isoformat())
+        conn.execute(CACHE_PUT_SQL, (product_id, creator_id))
+
+def cache_get_many(product_ids: List[str]) -> Dict[str, str]:
+    """Fresh creator_id for every cached product, memory first, then one IN query."""
+    out: Dict[str, str] = {}
+    misses: List[str] = []
+    now = time.monotonic()
+    for pid in product_ids:
+        hit = _mem_cache_get(pid, now)
+        if hit:
+            out[pid] = hit
+        else:
+            misses.append(pid)
+    if misses:
+        # seconds of TTL left, computed by SQLite (julianday reads either timestamp format)
+        rows = _select_in(
+            "SELECT product_id, creator_id, (julianday(fetched_at) - julianday('now')) * 86400.0 + ? "
+            "FROM cache_products WHERE product_id IN ({ids}) AND creator_id != ''",
+            misses, (PRODUCT_CACHE_TTL_HOURS * 3600,)
         )
+        for pid, cid, remaining in rows:
+            if remaining is not None and remaining > 0:
+                out[pid] = cid
+                _mem_cache_set(pid, cid, remaining)
+    return out
+
+def cache_put_many(rows: List[Tuple[str, str]]):
+    """Store (product_id, creator_id) pairs in one transaction."""
+    rows = [(pid, cid) for pid, cid in rows if cid]
+    if not rows:
+        return
+    for pid, cid in rows:
+        _mem_cache_set(pid, cid, PRODUCT_CACHE_TTL_HOURS * 3600)
+    with db() as conn:
+        conn.executemany(CACHE_PUT_SQL, rows)
+
+async def resolve_creators(product_ids: List[str], session: aiohttp.ClientSession,
+                           sem: Admission) -> Dict[str, str]:
+    """product_id -> creator_id for every resolvable product: cache first, misses fetched concurrently."""
+    pids = list(dict.fromkeys(product_ids))
+    out = cache_get_many(pids)
+    misses = [p for p in pids if p not in out]
+    found = await asyncio.gather(*(_scrape_product_creator(session, p, sem) for p in misses),
+                                 return_exceptions=True)
+    fresh = [(p, c) for p, c in zip(misses, found) if isinstance(c, str) and c]
+    cache_put_many(fresh)
+    out.update(fresh)
+    return out
 
-async def evaluate_user(username: str):
+async def evaluate_user(username: str, allowed_creators: Optional[List[str]] = None):
     wl_url, product_ids = await wishlist_url_and_products(username)
     if not wl_url or not product_ids:
         return (0, {})
-    timeout = aiohttp.ClientTimeout(total=25, connect=10)
-    async with aiohttp.ClientSession(timeout=timeout, headers=DEFAULT_HEADERS) as s:
-        sem = asyncio.Semaphore(PRODUCT_CONCURRENCY)
-        creators = await asyncio.gather(*[product_creator_id(s, pid, sem) for pid in product_ids])
+    # ANY mode: stop fetching as soon as one allowed shop reaches the threshold;
+    # without an explicit list that's every configured creator
+    if allowed_creators is None:
+        allowed_creators = [cid for cid, _ in list_creators()]
+    allowed = set(allowed_creators)
+    thr = max(1, int(get_rule("threshold", "1"))) if get_rule("mode", "NONE").upper() == "ANY" else 0
     per: Dict[str,int] = {}
-    for cid in creators:
-        if not cid: continue
+    # cached products in one query; only the misses go to the network
+    hits = cache_get_many(product_ids)
+    for cid in hits.values():
         per[cid] = per.get(cid,0) + 1
+    if thr and any(per.get(cid,0) >= thr for cid in allowed):
+        return (len(product_ids), per)
+
+    s, sem = http_session(), product_sem()
+    async def scrape(pid: str):
+        return pid, await _scrape_product_creator(s, pid, sem)
+
+    fresh: List[Tuple[str, str]] = []
+    pending = [asyncio.ensure_future(scrape(pid)) for pid in product_ids if pid not in hits]
+    try:
+        for fut in asyncio.as_completed(pending):
+            pid, cid = await fut
+            if not cid: continue
+            fresh.append((pid, cid))
+            per[cid] = per.get(cid,0) + 1
+            if thr and cid in allowed and per[cid] >= thr:
+                break
+    finally:
+        for t in pending:
+            t.cancel()
+        cache_put_many(fresh)
     return (len(product_ids), per)
 
 def _eligible_by_creator_rule(per_creator: Dict[str,int], rules: Dict[str,str], allowed_creators: List[str]) -> bool:
@@ -466,18 +948,31 @@ def _eligible_by_creator_rule(per_creator: Dict[str,int], rules: Dict[str,str],
             return any(per_creator.get(cid, 0) >= thr for cid in allowed)
         return all(per_creator.get(cid, 0) >= thr for cid in allowed)
     if mode == "MAP":
-        try:
-            req = json.loads(rules.get("map_json", "{}"))
-        except Exception:
-            req = {}
+        req = _map_requirements(rules.get("map_json", "{}"))
         if not req:
             return True
-        for cid, need in req.items():
-            if per_creator.get(str(cid), 0) < int(need):
+        for cid, need in req:
+            if per_creator.get(cid, 0) < need:
                 return False
         return True
     return True
 
+# Parsed rule values as key -> (raw string, parsed); cleared by set_rule, re-parsed if the raw differs
+_RULES_PARSED: Dict[str, Tuple[str, List[Tuple[str, int]]]] = {}
+
+def _map_requirements(raw: str) -> List[Tuple[str, int]]:
+    """MAP rule as [(creator_id, need)], strictest first so ineligible users fail fast."""
+    hit = _RULES_PARSED.get("map_json")
+    if hit and hit[0] == raw:
+        return hit[1]
+    try:
+        parsed = json.loads(raw or "{}")
+        req = sorted(((str(k), int(v)) for k, v in parsed.items()), key=lambda kv: -kv[1])
+    except Exception:
+        req = []
+    _RULES_PARSED["map_json"] = (raw, req)
+    return req
+
 # Return (imvu_username, first_product_id) a user submitted in this giveaway
 def giveaway_entry_username_and_pid(gid: int, discord_id: int) -> Tuple[Optional[str], Optional[str]]:
     with db() as conn:
@@ -489,11 +984,7 @@ def giveaway_entry_username_and_pid(gid: int, discord_id: int) -> Tuple[Optional
     if not row:
         return (None, None)
     uname, raw_pid = row
-    pid = None
-    if raw_pid:
-        ids = parse_product_ids(str(raw_pid), limit=1)
-        pid = ids[0] if ids else None
-    return (uname, pid)
+    return (uname, first_product_id(raw_pid))
 
 # =========================
 # Input sanitizers
@@ -511,32 +1002,37 @@ def normalize_username(raw: str) -> str:
 
 PROD_ID_RX = re.compile(r'(\d{5,})')
 def parse_product_ids(raw: str, limit: int = 10) -> List[str]:
-    ids = PROD_ID_RX.findall(raw or "")
-    seen, out = set(), []
-    for pid in ids:
-        if pid not in seen:
-            seen.add(pid); out.append(pid)
-        if len(out) >= limit: break
-    return out
+    return list(itertools.islice(dict.fromkeys(PROD_ID_RX.findall(raw or "")), limit))
+
+def first_product_id(raw) -> Optional[str]:
+    """First stored product id. Entries are saved as a digit CSV; anything else is re-parsed."""
+    raw = str(raw or "")
+    head = raw.split(",", 1)[0]
+    if len(head) >= 5 and head.isascii() and head.isdigit():
+        return head
+    ids = parse_product_ids(raw, limit=1)
+    return ids[0] if ids else None
 
 # Turn product IDs/URLs in the prize string into clickable links
 URL_RX = re.compile(r'(https?://\S+)', re.I)
+NON_DIGIT_RX = re.compile(r"\D")
+_NON_DIGIT_DROP = dict.fromkeys((i for i in range(128) if not chr(i).isdigit()), None)
 
 def imvu_product_link(pid: str) -> str:
-    pid = re.sub(r"\D", "", str(pid))
+    pid = str(pid)
+    pid = pid.translate(_NON_DIGIT_DROP) if pid.isascii() else NON_DIGIT_RX.sub("", pid)
     return f"https://www.imvu.com/shop/product.php?products_id={pid}"
 
+@functools.lru_cache(maxsize=512)  # pure str -> str; the same prize renders on every embed
 def format_prize_text(prize: str) -> str:
     prize = str(prize or "").strip()
     if not prize:
         return prize
     pids = parse_product_ids(prize, limit=5)
-    links: List[str] = []
-    for pid in pids:
-        links.append(f"<{imvu_product_link(pid)}>")
+    # ordered, de-duplicated; dict keys give O(1) membership
+    links = dict.fromkeys(f"<{imvu_product_link(pid)}>" for pid in pids)
     for m in URL_RX.findall(prize):
-        if m not in links:
-            links.append(m if m.startswith("<") else f"<{m}>")
+        links.setdefault(m if m.startswith("<") else f"<{m}>")
     return ", ".join(links) if links else prize
 
 # =========================
@@ -546,49 +1042,64 @@ CREATOR_NAME_RX_1 = re.compile(r'by\s*<a[^>]*>\s*([A-Za-z0-9_.\- ]{2,40})\s*</a>
 CREATOR_NAME_RX_2 = re.compile(r'(?:manufacturer|manufacturers?_name)\s*[:=]\s*["\']([^"\']{2,40})["\']', re.I)
 CREATOR_NAME_RX_3 = re.compile(r'<title>[^<]*\bby\s+([A-Za-z0-9_.\- ]{2,40})\b', re.I)
 
+def _creator_name_from_html(page: str) -> Optional[str]:
+    m = CREATOR_NAME_RX_1.search(page) or CREATOR_NAME_RX_2.search(page) or CREATOR_NAME_RX_3.search(page)
+    return html.unescape(m.group(1)).strip() if m else None
+
 async def fetch_creator_name(mid: str) -> Optional[str]:
     search_url = f"https://www.imvu.com/shop/web_search.php?manufacturers_id={mid}"
-    timeout = aiohttp.ClientTimeout(total=12, connect=8)
-    async with aiohttp.ClientSession(timeout=timeout, headers=DEFAULT_HEADERS) as s:
-        html_text = await _fetch_html(search_url, s, min_len=400)
-        if html_text:
-            m = CREATOR_NAME_RX_1.search(html_text) or CREATOR_NAME_RX_2.search(html_text) or CREATOR_NAME_RX_3.search(html_text)
-            if m:
-                return html.unescape(m.group(1)).strip()
-            pids = _product_ids_from_html(html_text)
-            for pid in pids[:3]:
-                for purl in (
-                    f"https://www.imvu.com/shop/product/{pid}",
-                    f"https://www.imvu.com/shop/product.php?products_id={pid}",
-                ):
-                    phtml = await _fetch_html(purl, s, min_len=400)
-                    if not phtml:
-                        continue
-                    m2 = CREATOR_NAME_RX_1.search(phtml) or CREATOR_NAME_RX_2.search(phtml) or CREATOR_NAME_RX_3.search(phtml)
-                    if m2:
-                        return html.unescape(m2.group(1)).strip()
+    s = http_session()
+    html_text = await _fetch_html(search_url, s, min_len=400, timeout=SHORT_TIMEOUT)
+    if html_text:
+        name = _creator_name_from_html(html_text)
+        if name:
+            return name
+        pids = await asyncio.to_thread(_product_ids_from_html, html_text)
+        for pid in pids[:3]:
+            for purl in (
+                f"https://www.imvu.com/shop/product/{pid}",
+                f"https://www.imvu.com/shop/product.php?products_id={pid}",
+            ):
+                phtml = await _fetch_html(purl, s, min_len=400, timeout=SHORT_TIMEOUT)
+                if not phtml:
+                    continue
+                name = _creator_name_from_html(phtml)
+                if name:
+                    return name
     return None
 
+# cid -> (name, fetched monotonic); shops repeat across giveaways
+CREATOR_NAME_CACHE: Dict[str, Tuple[str, float]] = {}
+
+async def cached_creator_name(mid: str) -> Optional[str]:
+    hit = CREATOR_NAME_CACHE.get(mid)
+    if hit and time.monotonic() - hit[1] < PRODUCT_CACHE_TTL_HOURS * 3600:
+        return hit[0]
+    name = await fetch_creator_name(mid)
+    if name:
+        CREATOR_NAME_CACHE[mid] = (name, time.monotonic())
+    return name
+
 def shop_masked_link(cid: str, label: Optional[str]) -> str:
     url = f"https://www.imvu.com/shop/web_search.php?manufacturers_id={cid}"
     return f"[{label or cid}]({url})"
     
 # --- helpers used by per-shop draw ---
-SHOP_LINK_RX = re.compile(r'manufacturers_id=(\d+)')
-
 async def get_giveaway_shops_from_embed(gid: int) -> List[str]:
     """Read the giveaway message embed and extract manufacturers_id values."""
-    with db() as conn:
-        row = conn.execute("SELECT channel_id, message_id FROM giveaways WHERE id=?", (gid,)).fetchone()
-    if not row or not row[0] or not row[1]:
-        return []
-    ch_id, msg_id = int(row[0]), int(row[1])
+    msg = MESSAGE_CACHE.get(gid)  # counter updates keep the posted message; no GET needed
+    if msg is None:
+        with db() as conn:
+            row = conn.execute("SELECT channel_id, message_id FROM giveaways WHERE id=?", (gid,)).fetchone()
+        if not row or not row[0] or not row[1]:
+            return []
+        ch_id, msg_id = int(row[0]), int(row[1])
 
-    channel = bot.get_channel(ch_id) or await bot.fetch_channel(ch_id)
-    try:
-        msg = await channel.fetch_message(msg_id)
-    except Exception:
-        return []
+        channel = await resolve_channel(ch_id)
+        try:
+            msg = await channel.fetch_message(msg_id)
+        except Exception:
+            return []
 
     if not msg.embeds:
         return []
@@ -597,7 +1108,7 @@ async def get_giveaway_shops_from_embed(gid: int) -> List[str]:
     ids = SHOP_LINK_RX.findall(desc)
     # fallback: if someone pasted bare CIDs in text
     if not ids:
-        ids = re.findall(r'\b(\d{5,})\b', desc)
+        ids = BARE_ID_RX.findall(desc)
     # uniq, keep order
     return list(dict.fromkeys(ids))
 
@@ -613,7 +1124,7 @@ def giveaway_entry_raw_products(gid: int, uid: int) -> List[str]:
         return []
     return parse_product_ids(str(row[0]), limit=10)
 
-async def find_pid_for_shop(session: aiohttp.ClientSession, sem: asyncio.Semaphore,
+async def find_pid_for_shop(session: aiohttp.ClientSession, sem: Admission,
                             pid_list: List[str], shop_cid: str) -> Optional[str]:
     """Pick the first PID from pid_list that belongs to the given manufacturer (shop_cid)."""
     for pid in pid_list:
@@ -647,112 +1158,109 @@ class EnterModal(ui.Modal, title="⚡ WISH — Enter Giveaway"):
             return await interaction.response.send_message(
                 "Enter a valid **IMVU username** and at least **one** product ID/link.", ephemeral=True
             )
-        # one entry per user per giveaway — allow edits instead of blocking
-        with db() as conn:
-            cur = conn.execute(
-                "SELECT 1 FROM giveaway_entries WHERE giveaway_id=? AND discord_id=?",
-                (gid, str(interaction.user.id))
-            )
-            exists = cur.fetchone() is not None
-
         await interaction.response.defer(ephemeral=True, thinking=True)
 
-        # Trust entrant input; store ALL submitted IDs (comma-joined)
+        # Trust entrant input; store ALL submitted IDs (comma-joined).
+        # One entry per user per giveaway — a repeat submit edits it instead of blocking.
         all_ids_csv = ",".join(ids)
+        edited = giveaway_save_entry(gid, interaction.user.id, uname, all_ids_csv)
 
-        if exists:
-            # UPDATE existing record (edit entry)
-            with db() as conn:
-                conn.execute(
-                    "UPDATE giveaway_entries "
-                    "SET imvu_username=?, wishlist_product_id=?, created_at=datetime('now') "
-                    "WHERE giveaway_id=? AND discord_id=?",
-                    (uname, all_ids_csv, gid, str(interaction.user.id))
-                )
-            # ensure participant row exists/refresh
-            upsert_entrant(interaction.user.id, uname, total_items=0, eligible=1)
-
-            await update_giveaway_counter_embed(gid)
+        schedule_counter_update(gid)
+        if edited:
             return await interaction.followup.send(
                 f"✏️ Updated your entry as **{uname}** (saved **{len(ids)}** product ID(s)).",
                 ephemeral=True
             )
-        else:
-            # NEW entry
-            try:
-                giveaway_add_entry(gid, interaction.user.id, uname, all_ids_csv)
-            except sqlite3.IntegrityError:
-                # rare race: fallback to update
-                with db() as conn:
-                    conn.execute(
-                        "UPDATE giveaway_entries "
-                        "SET imvu_username=?, wishlist_product_id=?, created_at=datetime('now') "
-                        "WHERE giveaway_id=? AND discord_id=?",
-                        (uname, all_ids_csv, gid, str(interaction.user.id))
-                    )
-
-            upsert_entrant(interaction.user.id, uname, total_items=0, eligible=1)
-
-            await update_giveaway_counter_embed(gid)
-            return await interaction.followup.send(
-                f"✅ Entered as **{uname}** (saved **{len(ids)}** product ID(s)).",
-                ephemeral=True
-            )
+        return await interaction.followup.send(
+            f"✅ Entered as **{uname}** (saved **{len(ids)}** product ID(s)).",
+            ephemeral=True
+        )
 
  
 class EnterButton(ui.View):
-    def __init__(self, giveaway_id: int, disabled: bool = False, timeout=None):
+    """Stateless: one instance registered at startup serves every giveaway post;
+    the giveaway is looked up from the clicked message id."""
+    def __init__(self, disabled: bool = False, timeout=None):
         super().__init__(timeout=timeout)
-        self.gid = giveaway_id
-        # make the button route uniquely even after restarts
-        self.enter_btn.custom_id = f"wish:enter:{giveaway_id}"
         self.enter_btn.disabled = disabled
 
     @ui.button(label="Enter Giveaway", style=discord.ButtonStyle.primary, custom_id="wish:enter_btn")
     async def enter_btn(self, interaction: discord.Interaction, button: ui.Button):
-        await interaction.response.send_modal(EnterModal(self.gid))
+        gid = giveaway_id_for_message(interaction.message.id)
+        if gid is None:
+            return await interaction.response.send_message(
+                "This giveaway button is stale. Ask an admin to rebind.", ephemeral=True
+            )
+        await interaction.response.send_modal(EnterModal(gid))
+
+
+_BG_TASKS: set = set()
 
+def spawn(coro) -> asyncio.Task:
+    """create_task that keeps a reference until the task finishes."""
+    task = asyncio.create_task(coro)
+    _BG_TASKS.add(task)
+    task.add_done_callback(_BG_TASKS.discard)
+    return task
+
+# Coalesce bursts of entries into one counter edit per giveaway per window (edits are rate-limited).
+# The first entry arms the timer and later ones ride along, so a steady stream can't starve the edit.
+COUNTER_DEBOUNCE_SECS = 2.0
+PENDING_EDITS: Dict[int, asyncio.TimerHandle] = {}
+
+def schedule_counter_update(gid: int):
+    if gid in PENDING_EDITS:
+        return  # the pending edit reads the count when it fires
+    PENDING_EDITS[gid] = asyncio.get_running_loop().call_later(COUNTER_DEBOUNCE_SECS, _flush_counter, gid)
+
+def _flush_counter(gid: int):
+    PENDING_EDITS.pop(gid, None)
+    spawn(update_giveaway_counter_embed(gid))
+
+# gid -> last known giveaway message, so counter updates skip the fetch_message GET
+MESSAGE_CACHE: Dict[int, discord.Message] = {}
 
 async def update_giveaway_counter_embed(giveaway_id: int):
-    with db() as conn:
-        cur = conn.execute("SELECT channel_id, message_id FROM giveaways WHERE id=?", (giveaway_id,))
-        row = cur.fetchone()
-    if not row: return
-    ch_id, msg_id = map(int, row)
-    channel = bot.get_channel(ch_id)
-    if not channel: return
-    try:
-        msg = await channel.fetch_message(msg_id)
-    except Exception:
-        return
+    msg = MESSAGE_CACHE.get(giveaway_id)
+    if msg is None:
+        with db() as conn:
+            cur = conn.execute("SELECT channel_id, message_id FROM giveaways WHERE id=?", (giveaway_id,))
+            row = cur.fetchone()
+        if not row: return
+        ch_id, msg_id = map(int, row)
+        channel = CHANNEL_CACHE.get(ch_id) or bot.get_channel(ch_id)
+        if not channel: return
+        try:
+            msg = await channel.fetch_message(msg_id)
+        except Exception:
+            return
     count = giveaway_count_entries(giveaway_id)
     if not msg.embeds: return
-    e = msg.embeds[0]
-    new = discord.Embed(title=e.title, description=e.description, color=e.color)
-    if e.footer and e.footer.text:
-        new.set_footer(text=e.footer.text)
-    has_field = False
-    for f in e.fields:
-        if f.name == "Participants":
-            new.add_field(name="Participants", value=str(count), inline=True); has_field = True
-        else:
-            new.add_field(name=f.name, value=f.value, inline=f.inline)
-    if not has_field:
-        new.add_field(name="Participants", value=str(count), inline=True)
-    if e.thumbnail and e.thumbnail.url:
-        new.set_thumbnail(url=e.thumbnail.url)
-    await msg.edit(embed=new, view=EnterButton(giveaway_id))
+    e = msg.embeds[0].copy()  # the cached message keeps its embed until the edit lands
+    idx = next((i for i, f in enumerate(e.fields) if f.name == "Participants"), None)
+    if idx is None:
+        e.add_field(name="Participants", value=str(count), inline=True)
+    elif e.fields[idx].value == str(count):
+        return  # post already shows this count (cache holds only successful edits); skip the REST call
+    else:
+        e.set_field_at(idx, name="Participants", value=str(count), inline=True)
+    try:
+        # no view=: the persistent button is already on the post, leave components untouched
+        MESSAGE_CACHE[giveaway_id] = await msg.edit(embed=e)
+    except Exception as ex:
+        MESSAGE_CACHE.pop(giveaway_id, None)  # refetch next time rather than trust a stale copy
+        log.warning("counter edit failed for gid %s: %s", giveaway_id, ex)
 
 # =========================
 # /wish — ONE admin modal
 # =========================
 DUR_RX = re.compile(r'^\s*(\d+)\s*([smhdw])\s*$', re.I)
+_DUR_MULT = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
 def parse_duration_to_seconds(s: str) -> int:
     m = DUR_RX.match(s or "")
     if not m: raise ValueError("Use formats like 30m, 2h, 1d, 1w")
-    n, unit = int(m.group(1)), m.group(2).lower()
-    mult = dict(s=1, m=60, h=3600, d=86400, w=604800)[unit]
-    return n * mult
+    return int(m.group(1)) * _DUR_MULT[m.group(2).lower()]
 
 class WishSingle(ui.Modal, title="Create WISH Giveaway"):
     duration = ui.TextInput(label="Duration", placeholder="30m, 24h, 3d, 1w", required=True)
@@ -774,19 +1282,16 @@ class WishSingle(ui.Modal, title="Create WISH Giveaway"):
         await interaction.response.defer()
 
         # resolve shops (IDs -> display name), also collect clickable links
-        ids = re.findall(r'(\d{5,})', str(self.shops or ""))
-        unique_ids = list(dict.fromkeys(ids))
+        unique_ids = list({m.group(0): None for m in PROD_ID_RX.finditer(str(self.shops or ""))})
         creator_names: List[str] = []
         creator_clicks: List[str] = []
-        for cid in unique_ids:
-            add_creator(cid, None)
-            name = None
-            try:
-                name = await asyncio.wait_for(fetch_creator_name(cid), timeout=4.0)
-            except Exception:
-                name = None
-            if name:
-                add_creator(cid, name)
+        names = await asyncio.gather(
+            *(asyncio.wait_for(cached_creator_name(cid), timeout=4.0) for cid in unique_ids),
+            return_exceptions=True
+        )
+        names = [None if isinstance(n, BaseException) else n for n in names]
+        add_creators(list(zip(unique_ids, names)))
+        for cid, name in zip(unique_ids, names):
             creator_names.append(name or cid)
             creator_clicks.append(shop_masked_link(cid, name or cid))
 
@@ -823,8 +1328,10 @@ class WishSingle(ui.Modal, title="Create WISH Giveaway"):
         embed.add_field(name="Participants", value="0", inline=True)
 
         try:
-            msg = await interaction.channel.send(embed=embed, view=EnterButton(gid))
+            msg = await interaction.channel.send(embed=embed, view=EnterButton())
             giveaway_set_message(gid, msg.id)
+            MESSAGE_CACHE[gid] = msg
+            schedule_draw(gid, end_at_utc)
         except Exception as e:
             await interaction.followup.send(f"Couldn’t post the giveaway: {e}", ephemeral=True)
 
@@ -837,6 +1344,8 @@ async def wish_cmd(interaction: discord.Interaction):
 # =========================
 # Reroll
 # =========================
+MESSAGE_LINK_RX = re.compile(r"/channels/\d+/(\d+)/(\d+)$")
+
 @tree.command(name="rebind_link", description="Admin: rebind or adopt a giveaway by message link (hard refresh).")
 @app_commands.describe(
     message_link="Right-click the stale post → Copy Message Link",
@@ -851,7 +1360,7 @@ async def rebind_link_cmd(
         return await interaction.response.send_message("Admins only.", ephemeral=True)
 
     # Parse the channel & message IDs from the link
-    m = re.search(r"/channels/\d+/(\d+)/(\d+)$", message_link.strip())
+    m = MESSAGE_LINK_RX.search(message_link.strip())
     if not m:
         return await interaction.response.send_message("I couldn’t parse that message link.", ephemeral=True)
     ch_id, msg_id = int(m.group(1)), int(m.group(2))
@@ -881,25 +1390,29 @@ async def rebind_link_cmd(
 
     with db() as conn:
         conn.execute("UPDATE giveaways SET status='OPEN', end_at=? WHERE id=?", (new_end, gid))
+    schedule_draw(gid, datetime.fromisoformat(new_end))
 
-    # Hard-refresh the actual message you linked
-    ch  = bot.get_channel(ch_id) or await bot.fetch_channel(ch_id)
+    # Hard-refresh the actual message you linked; view= replaces every legacy component in one PATCH
+    ch  = await resolve_channel(ch_id)
     msg = await ch.fetch_message(msg_id)
-    view = EnterButton(gid, disabled=False, timeout=None)
-    try:
-        await msg.edit(view=None)   # clear legacy components
-    except Exception:
-        pass
-    await msg.edit(view=view)       # attach our button
-    bot.add_view(view)              # register handler
+    await msg.edit(view=EnterButton())  # attach our button (routed by message id)
 
     return await interaction.response.send_message(
         f"✅ Rebound **#{gid}** in <#{ch_id}> (ends {discord.utils.format_dt(datetime.fromisoformat(new_end), style='R')}).",
         ephemeral=True
     )
+async def _latest_wish_post(ch, after=None):
+    """Newest WISH giveaway post by this bot among the last 50 messages (newer than `after`)."""
+    async for m in ch.history(limit=50, after=after, oldest_first=False):
+        if m.author.id == bot.user.id and m.embeds and (m.embeds[0].title or "").strip() == "⚡ WISH — Giveaway":
+            return m
+    return None
+
 @tree.command(name="rebind_here", description="Admin: rebind/adopt the latest WISH giveaway in this channel.")
 @app_commands.describe(duration="Keep it open from now (e.g., 19h, 1d, 45m). Default 2d.")
 async def rebind_here_cmd(interaction: discord.Interaction, duration: str = "2d"):
+    """Rebind the latest WISH giveaway post in this channel. The DB's open/drawing giveaway
+    is only a shortcut and is used when no newer WISH post follows it."""
     if not interaction.user.guild_permissions.administrator:
         return await interaction.response.send_message("Admins only.", ephemeral=True)
     try:
@@ -908,31 +1421,41 @@ async def rebind_here_cmd(interaction: discord.Interaction, duration: str = "2d"
         secs = 48 * 3600
     new_end_dt = datetime.now(timezone.utc) + timedelta(seconds=secs)
 
-    # find the latest WISH giveaway embed in this channel
+    # The target is always the latest WISH post in this channel. The DB's newest open/drawing
+    # post here only narrows the scan: history is read after it, so a newer post (untracked
+    # or already DONE) still wins, and the probed post is used only when nothing follows it.
     ch = interaction.channel
-    target = None
-    async for m in ch.history(limit=50, oldest_first=False):
-        if m.author.id == bot.user.id and m.embeds and (m.embeds[0].title or "").strip() == "⚡ WISH — Giveaway":
-            target = m
-            break
+    target, gid = None, None
+    with db() as conn:
+        row = conn.execute(
+            "SELECT id, message_id FROM giveaways WHERE channel_id=? AND status IN ('OPEN','DRAWING') "
+            "AND message_id != '' ORDER BY CAST(message_id AS INTEGER) DESC LIMIT 1", (str(ch.id),)
+        ).fetchone()
+    after = discord.Object(id=int(row[1])) if row else None
+    target = await _latest_wish_post(ch, after=after)
+    if not target and row:
+        try:
+            target, gid = await ch.fetch_message(int(row[1])), int(row[0])
+        except Exception:
+            target = await _latest_wish_post(ch)  # probed post is gone; scan recent history as before
+
     if not target:
         return await interaction.response.send_message("No WISH giveaway message found in this channel.", ephemeral=True)
 
-    with db() as conn:
-        row = conn.execute("SELECT id FROM giveaways WHERE message_id=?", (str(target.id),)).fetchone()
-    if row:
-        gid = int(row[0])
-    else:
-        gid = giveaway_insert(ch.id, "—", json.dumps({"shops": []}), 1, new_end_dt.isoformat(), interaction.user.id)
-        giveaway_set_message(gid, target.id)
+    if gid is None:
+        with db() as conn:
+            row = conn.execute("SELECT id FROM giveaways WHERE message_id=?", (str(target.id),)).fetchone()
+        if row:
+            gid = int(row[0])
+        else:
+            gid = giveaway_insert(ch.id, "—", json.dumps({"shops": []}), 1, new_end_dt.isoformat(), interaction.user.id)
+            giveaway_set_message(gid, target.id)
 
     with db() as conn:
         conn.execute("UPDATE giveaways SET status='OPEN', end_at=? WHERE id=?", (new_end_dt.isoformat(), gid))
+    schedule_draw(gid, new_end_dt)
 
-    view = EnterButton(gid, disabled=False, timeout=None)
-    await target.edit(view=None)
-    await target.edit(view=view)
-    bot.add_view(view)
+    await target.edit(view=EnterButton())  # replaces any old components
 
     return await interaction.response.send_message(
         f"✅ Rebound **#{gid}** here. Ends {discord.utils.format_dt(new_end_dt, style='R')}.",
@@ -947,42 +1470,34 @@ async def reroll_cmd(interaction: discord.Interaction, giveaway_id: int, count:
         return await interaction.response.send_message("Admins only.", ephemeral=True)
 
     with db() as conn:
-        row = conn.execute("SELECT channel_id, prize FROM giveaways WHERE id=?", (giveaway_id,)).fetchone()
+        row = conn.execute("SELECT channel_id, prize, prize_html FROM giveaways WHERE id=?", (giveaway_id,)).fetchone()
     if not row:
         return await interaction.response.send_message("Unknown giveaway ID.", ephemeral=True)
-    ch_id, prize = int(row[0]), row[1]
+    ch_id, prize_html = int(row[0]), row[2] or format_prize_text(row[1])
     channel = bot.get_channel(ch_id)
     if not channel:
         return await interaction.response.send_message("I can't see that channel anymore.", ephemeral=True)
 
-    entries = giveaway_entry_user_ids(giveaway_id)
-    already = set(list_giveaway_winners(giveaway_id))
-    pool = [u for u in entries if u not in already]
+    pool = giveaway_reroll_pool(giveaway_id)
     if not pool:
         return await interaction.response.send_message("No remaining entrants to reroll from.", ephemeral=True)
 
     if ONE_WIN_ONLY:
-        with db() as conn:
-            pool = [
-                u for u in pool
-                if not (conn.execute(
-                    "SELECT last_win_at FROM Participants WHERE discord_id=?",
-                    (str(u),)
-                ).fetchone() or [None])[0]
-            ]
+        last_win = fetch_last_win_map(pool)
+        pool = [u for u in pool if not last_win.get(u)]
         if not pool:
             return await interaction.response.send_message(
                 "No eligible entrants left to reroll (lifetime one-win is enabled).",
                 ephemeral=True
             )
 
-    random.shuffle(pool)
-    picks = pool[:max(1, int(count))]
+    picks = pick_k(pool, max(1, int(count)))
 
     # announce & buttons
     rows = []
+    pid_map = giveaway_entry_product_ids(giveaway_id, picks)
     for u in picks:
-        pid = giveaway_entry_product_id(giveaway_id, u)
+        pid = pid_map.get(u)
         if pid:
             url = imvu_product_link(pid)
             rows.append(f"• <@{u}> — <{url}>")
@@ -992,32 +1507,25 @@ async def reroll_cmd(interaction: discord.Interaction, giveaway_id: int, count:
 
     text = (
         f"🔁 **REROLL** for Giveaway #{giveaway_id}\n"
-        f"**Prize:** {format_prize_text(prize)}\n"
+        f"**Prize:** {prize_html}\n"
         f"**New winner{'s' if len(picks)!=1 else ''}:**\n{lines}"
     )
     view = ui.View(timeout=None)
-    with db() as conn:
-        for uid in picks:
-            rowu = conn.execute(
-                "SELECT imvu_username FROM giveaway_entries "
-                "WHERE giveaway_id=? AND discord_id=? LIMIT 1",
-                (giveaway_id, str(uid))
-            ).fetchone()
-            if not rowu or not rowu[0]:
-                continue
-            uname = (rowu[0] or "").strip()
-            url = imvu_profile_link(uname)
-            label = f"Gift {uname}"[:80]
-            view.add_item(ui.Button(style=discord.ButtonStyle.link, label=label, url=url))
+    names = giveaway_entry_usernames(giveaway_id, picks)
+    for uid in picks:
+        uname = names.get(uid)
+        if not uname:
+            continue
+        url = imvu_profile_link(uname)
+        label = f"Gift {uname}"[:80]
+        view.add_item(ui.Button(style=discord.ButtonStyle.link, label=label, url=url))
     view_to_send = view if len(view.children) > 0 else None
     try:
         await channel.send(text, view=view_to_send)
     except Exception:
         pass
 
-    for uid in picks:
-        set_winner(uid)
-        add_giveaway_winner(giveaway_id, uid)
+    record_giveaway_winners(giveaway_id, picks)
 
     await interaction.response.send_message(f"Rerolled ✅ Picked {len(picks)} new winner(s).", ephemeral=True)
 
@@ -1032,8 +1540,7 @@ def giveaway_entry_product_id(gid: int, discord_id: int) -> Optional[str]:
         row = cur.fetchone()
     if not row or not row[0]:
         return None
-    ids = parse_product_ids(str(row[0]), limit=1)
-    return ids[0] if ids else None
+    return first_product_id(row[0])
 
 # ======== Per-shop picking helpers ========
 def giveaway_entry_raw_products(gid: int, discord_id: int) -> List[str]:
@@ -1046,7 +1553,7 @@ def giveaway_entry_raw_products(gid: int, discord_id: int) -> List[str]:
         return []
     return parse_product_ids(str(row[0]), limit=10)
 
-async def find_pid_for_shop(session: aiohttp.ClientSession, sem: asyncio.Semaphore,
+async def find_pid_for_shop(session: aiohttp.ClientSession, sem: Admission,
                             pid_list: List[str], shop_cid: str) -> Optional[str]:
     for pid in pid_list:
         cid = await product_creator_id(session, pid, sem)
@@ -1062,13 +1569,29 @@ def giveaway_entries_with_pid(gid: int) -> List[Tuple[int, Optional[str]]]:
         )
         rows = []
         for uid, raw in cur.fetchall():
-            pid = parse_product_ids(str(raw or ""), limit=1)
-            rows.append((int(uid), pid[0] if pid else None))
+            rows.append((int(uid), first_product_id(raw)))
     return rows
 
 # =========================
 # Draw/close watcher (one winner per shop if shops were supplied)
 # =========================
+def giveaway_entries_for_draw(gid: int) -> List[Tuple[int, str, bool]]:
+    """(uid, raw product IDs, blocked) for every entrant, via one JOIN.
+
+    blocked = ONE_WIN_ONLY and has won before, or won within WIN_COOLDOWN_DAYS.
+    julianday() reads both the old isoformat and the datetime('now') stamps;
+    an unparsable stamp counts as long ago.
+    """
+    with db() as conn:
+        cur = conn.execute(
+            "SELECT e.discord_id, e.wishlist_product_id, "
+            "  COALESCE(p.last_win_at, '') != '' AND (? OR julianday(p.last_win_at) > julianday('now', ?)) "
+            "FROM giveaway_entries e LEFT JOIN Participants p ON p.discord_id = e.discord_id "
+            "WHERE e.giveaway_id=?",
+            (int(ONE_WIN_ONLY), f"-{max(0, WIN_COOLDOWN_DAYS)} days", gid)
+        )
+        return [(int(uid), raw or "", bool(b)) for uid, raw, b in cur.fetchall()]
+
 def giveaway_claim(gid: int) -> bool:
     with db() as conn:
         cur = conn.execute(
@@ -1077,212 +1600,229 @@ def giveaway_claim(gid: int) -> bool:
         )
         return cur.rowcount > 0
 
-@tasks.loop(seconds=30)
+# Each OPEN giveaway gets a timer at its end_at; the watcher below is only a safety net.
+DRAW_TIMERS: Dict[int, asyncio.TimerHandle] = {}
+DRAW_RETRY_SECS = 30  # a failed draw is re-armed this soon instead of waiting for the watcher sweep
+
+def schedule_draw(gid: int, end_at_utc: datetime):
+    """(Re)arm the draw timer for a giveaway; safe to call again after a rebind."""
+    old = DRAW_TIMERS.pop(gid, None)
+    if old:
+        old.cancel()
+    delay = max(0.0, (end_at_utc - datetime.now(timezone.utc)).total_seconds())
+    DRAW_TIMERS[gid] = asyncio.get_running_loop().call_later(delay, _start_draw, gid)
+
+def _start_draw(gid: int):
+    DRAW_TIMERS.pop(gid, None)
+    spawn(draw_giveaway(gid))
+
+def _parse_end_at(end_at: str) -> datetime:
+    try:
+        dt = datetime.fromisoformat(end_at)
+    except Exception:
+        return datetime.now(timezone.utc)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+def schedule_open_draws():
+    with db() as conn:
+        rows = conn.execute("SELECT id, end_at FROM giveaways WHERE status='OPEN'").fetchall()
+    for gid, end_at in rows:
+        schedule_draw(gid, _parse_end_at(end_at))
+
+@tasks.loop(minutes=5)
 async def giveaway_watcher():
     now = datetime.now(timezone.utc)
     with db() as conn:
         cur = conn.execute(
-            # FIX: match unpack count (5)
-            "SELECT id, channel_id, message_id, winners, prize "
-            "FROM giveaways WHERE status='OPEN' AND end_at <= ?",
+            "SELECT id FROM giveaways WHERE status='OPEN' AND end_at <= ?",
             (now.isoformat(),)
         )
         due = cur.fetchall()
-    if not due:
-        return
+    # giveaways ending together draw side by side; each one catches its own errors
+    await asyncio.gather(*(draw_giveaway(gid) for (gid,) in due), return_exceptions=True)
 
-    for gid, ch_id, msg_id, winners, prize in due:
-        try:
-            # claim so only one worker handles this giveaway
-            if not giveaway_claim(gid):
-                continue
+async def _disable_enter_button(channel, msg_id):
+    try:
+        if int(msg_id):
+            msg = await channel.fetch_message(int(msg_id))
+            await msg.edit(view=EnterButton(disabled=True))
+    except Exception:
+        pass
 
-            # get channel (cache first, then API)
-            channel = bot.get_channel(int(ch_id))
-            if channel is None:
-                channel = await bot.fetch_channel(int(ch_id))
+# gids being drawn in this process; the DB claim stays authoritative across restarts
+DRAWING: set = set()
 
-            # disable the Enter button on the original message (best effort)
-            try:
-                if int(msg_id):
-                    msg = await channel.fetch_message(int(msg_id))
-                    await msg.edit(view=EnterButton(gid, disabled=True))
-            except Exception:
-                pass
-
-            # -------- pick winners (one per shop if shops were supplied) --------
-            entries = giveaway_entry_user_ids(gid)
-            winners_n = max(1, int(winners))
-
-            picks: List[Tuple[int, Optional[str]]] = []   # (uid, matched_pid)
-            picked_users: set[int] = set()
-            pool = list(entries)
-            random.shuffle(pool)
-
-            # CHANGED: resolve shops preferring rules, fallback to embed
-            shops = await resolve_giveaway_shops(gid)
-            sem = asyncio.Semaphore(PRODUCT_CONCURRENCY)
-
-            async with aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=25, connect=10),
-                headers=DEFAULT_HEADERS
-            ) as session:
-                if shops:
-                    # try to award one unique user per shop
-                    for shop_cid in shops:
-                        # build eligible candidates (respect ONE_WIN_ONLY / cooldown)
-                        candidates: List[int] = []
-                        with db() as conn:
-                            for uid in pool:
-                                if uid in picked_users:
-                                    continue
-                                row = conn.execute(
-                                    "SELECT last_win_at FROM Participants WHERE discord_id=?",
-                                    (str(uid),)
-                                ).fetchone()
-
-                                if ONE_WIN_ONLY:
-                                    if row and row[0]:
-                                        continue
-                                elif WIN_COOLDOWN_DAYS > 0 and row and row[0]:
-                                    try:
-                                        lw = datetime.fromisoformat(row[0].replace("Z","")).replace(tzinfo=timezone.utc)
-                                    except Exception:
-                                        lw = datetime.now(timezone.utc) - timedelta(days=9999)
-                                    if lw > datetime.now(timezone.utc) - timedelta(days=WIN_COOLDOWN_DAYS):
-                                        continue
-
-                                candidates.append(uid)
-
-                        random.shuffle(candidates)
-
-                        chosen: Optional[Tuple[int, Optional[str]]] = None
-                        for uid in candidates:
-                            pid_list = giveaway_entry_raw_products(gid, uid)
-                            if not pid_list:
-                                continue
-                            match_pid = await find_pid_for_shop(session, sem, pid_list, shop_cid)
-                            if match_pid:
-                                chosen = (uid, match_pid)
-                                break
-
-                        if chosen:
-                            picks.append(chosen)
-                            picked_users.add(chosen[0])
-                            if len(picks) >= winners_n:
-                                break
-
-                # Fallback fill if we didn’t reach winners_n
-                if len(picks) < winners_n and pool:
-                    # If shops exist AND strict mode is on, do NOT fallback — keep only shop-matched winners
-                    if shops and STRICT_SHOP_MATCH:
-                        pass  # no fallback; winners remain as matched (possibly zero)
-                    else:
-                        with db() as conn:
-                            remaining = [u for u in pool if u not in picked_users]
-                            random.shuffle(remaining)
-                            for uid in remaining:
-                                row = conn.execute(
-                                    "SELECT last_win_at FROM Participants WHERE discord_id=?",
-                                    (str(uid),)
-                                ).fetchone()
-                
-                                if ONE_WIN_ONLY:
-                                    if row and row[0]:
-                                        continue
-                                elif WIN_COOLDOWN_DAYS > 0 and row and row[0]:
-                                    try:
-                                        lw = datetime.fromisoformat(row[0].replace("Z","")).replace(tzinfo=timezone.utc)
-                                    except Exception:
-                                        lw = datetime.now(timezone.utc) - timedelta(days=9999)
-                                    if lw > datetime.now(timezone.utc) - timedelta(days=WIN_COOLDOWN_DAYS):
-                                        continue
-                
-                                pid_list = giveaway_entry_raw_products(gid, uid)
-                                picks.append((uid, pid_list[0] if pid_list else None))
-                                if len(picks) >= winners_n:
-                                    break
-
-            # -------- build announcement text (FIX: define mention_line) --------
-            if not pool:
-                mention_line = "No entries 😔"
-            elif not picks:
-                mention_line = "No eligible Participants 😔"
-            else:
-                lines = []
-                for uid, pid in picks:
-                    if pid:
-                        url = imvu_product_link(pid)
-                        lines.append(f"• <@{uid}> — <{url}>")
-                    else:
-                        lines.append(f"• <@{uid}>")
-                mention_line = "\n".join(lines)
-
-            text = (
-                " **Giveaway Ended**\n\n"
-                f"**Prize:** {format_prize_text(prize)}\n\n"
-                f"**Winner{'s' if winners_n != 1 else ''}:**\n{mention_line}"
-            )
+async def draw_giveaway(gid: int):
+    if gid in DRAWING:
+        return  # the timer and the watcher can both fire; let the running draw finish
+    DRAWING.add(gid)
+    try:
+        await _draw_giveaway(gid)
+    finally:
+        DRAWING.discard(gid)
 
-            # profile buttons (one per winner, opens IMVU profile)
-            view = ui.View(timeout=None)
-            for uid, _pid in picks:
-                with db() as conn:
-                    rowu = conn.execute(
-                        "SELECT imvu_username FROM giveaway_entries "
-                        "WHERE giveaway_id=? AND discord_id=? LIMIT 1",
-                        (gid, str(uid))
-                    ).fetchone()
-                if not rowu or not rowu[0]:
-                    continue
-                uname = (rowu[0] or "").strip()
-                url = imvu_profile_link(uname)
-                label = f"Gift {uname}"[:80]
-                view.add_item(ui.Button(style=discord.ButtonStyle.link, label=label, url=url))
-            view_to_send = view if len(view.children) > 0 else None
+async def _draw_giveaway(gid: int):
+    with db() as conn:
+        row = conn.execute(
+            "SELECT channel_id, message_id, winners, prize_html, prize, end_at "
+            "FROM giveaways WHERE id=? AND status='OPEN'",
+            (gid,)
+        ).fetchone()
+    if not row:
+        return  # already drawn or claimed elsewhere
+    ch_id, msg_id, winners, prize_html, prize, end_at = row
+    prize_html = prize_html or format_prize_text(prize)
+    end_at_utc = _parse_end_at(end_at)
+    now = datetime.now(timezone.utc)
+    if end_at_utc > now:
+        # fired early or end_at was moved by a rebind: re-arm instead of drawing
+        return schedule_draw(gid, end_at_utc)
 
-            posted = False
-            try:
-                await channel.send(text, view=view_to_send)
-                posted = True
-            except Exception as e:
-                print(f"[wish] send failed for gid {gid} in ch {ch_id}: {e}")
-
-            if posted:
-                for uid, _pid in picks:
-                    set_winner(uid)
-                    add_giveaway_winner(gid, uid)
-                giveaway_mark_done(gid)
+    try:
+        # claim so only one worker handles this giveaway
+        if not giveaway_claim(gid):
+            return
+        MESSAGE_CACHE.pop(gid, None)
+        pending = PENDING_EDITS.pop(gid, None)
+        if pending:
+            pending.cancel()  # a late counter edit would re-enable the button
+
+        # get channel (cache first, then API)
+        channel = await resolve_channel(int(ch_id))
+
+        # disable the Enter button on the original message (best effort, overlaps the pick)
+        spawn(_disable_enter_button(channel, msg_id))
+
+        # -------- pick winners (one per shop if shops were supplied) --------
+        # entrants + cooldown verdict in one round-trip; SQL decides who may not win again
+        entry_rows = giveaway_entries_for_draw(gid)
+        raw_pids = {uid: raw for uid, raw, _b in entry_rows}
+        blocked = {uid for uid, _raw, b in entry_rows if b}
+        winners_n = max(1, int(winners))
+
+        picks: List[Tuple[int, Optional[str]]] = []   # (uid, matched_pid)
+        picked_users: set[int] = set()
+        pool = list(raw_pids)  # no shuffle: every pick below is a uniform draw of its own
+
+        # CHANGED: resolve shops preferring rules, fallback to embed
+        shops = await resolve_giveaway_shops(gid)
+        sem = product_sem()
+
+        session = http_session()
+        if shops:
+            # resolve every eligible entrant's products once: uid -> {creator_id: first pid}
+            user_pids = {u: parse_product_ids(raw_pids[u], limit=10) for u in pool if u not in blocked}
+            creators = await resolve_creators([p for pids in user_pids.values() for p in pids], session, sem)
+            shop_pid: Dict[int, Dict[str, str]] = {}
+            for uid, pids in user_pids.items():
+                by_shop = shop_pid[uid] = {}
+                for pid in pids:
+                    if pid in creators:
+                        by_shop.setdefault(creators[pid], pid)
+
+            # try to award one unique user per shop
+            for shop_cid in shops:
+                # eligible entrants with a product from this shop (respect ONE_WIN_ONLY / cooldown)
+                shop_cid = str(shop_cid)
+                candidates = [u for u in user_pids if u not in picked_users and shop_cid in shop_pid[u]]
+
+                # uniform among matches, same as shuffling then taking the first match
+                chosen: Optional[Tuple[int, Optional[str]]] = None
+                if candidates:
+                    uid = random.choice(candidates)
+                    chosen = (uid, shop_pid[uid][shop_cid])
+
+                if chosen:
+                    picks.append(chosen)
+                    picked_users.add(chosen[0])
+                    if len(picks) >= winners_n:
+                        break
+
+        # Fallback fill if we didn’t reach winners_n
+        if len(picks) < winners_n and pool:
+            # If shops exist AND strict mode is on, do NOT fallback — keep only shop-matched winners
+            if shops and STRICT_SHOP_MATCH:
+                pass  # no fallback; winners remain as matched (possibly zero)
             else:
-                with db() as conn:
-                    conn.execute("UPDATE giveaways SET status='OPEN' WHERE id=? AND status='DRAWING'", (gid,))
+                # filter in one pass, then sample uniformly; no DB calls in the pick loop
+                eligible = [u for u in pool if u not in picked_users and u not in blocked]
+
+                for uid in pick_k(eligible, winners_n - len(picks)):
+                    picks.append((uid, first_product_id(raw_pids.get(uid))))
+
+        # -------- build announcement text (FIX: define mention_line) --------
+        if not pool:
+            mention_line = "No entries 😔"
+        elif not picks:
+            mention_line = "No eligible Participants 😔"
+        else:
+            lines = []
+            for uid, pid in picks:
+                if pid:
+                    url = imvu_product_link(pid)
+                    lines.append(f"• <@{uid}> — <{url}>")
+                else:
+                    lines.append(f"• <@{uid}>")
+            mention_line = "\n".join(lines)
+
+        text = (
+            " **Giveaway Ended**\n\n"
+            f"**Prize:** {prize_html}\n\n"
+            f"**Winner{'s' if winners_n != 1 else ''}:**\n{mention_line}"
+        )
+
+        # profile buttons (one per winner, opens IMVU profile)
+        view = ui.View(timeout=None)
+        names = giveaway_entry_usernames(gid, [uid for uid, _pid in picks])
+        for uid, _pid in picks:
+            uname = names.get(uid)
+            if not uname:
+                continue
+            url = imvu_profile_link(uname)
+            label = f"Gift {uname}"[:80]
+            view.add_item(ui.Button(style=discord.ButtonStyle.link, label=label, url=url))
+        view_to_send = view if len(view.children) > 0 else None
 
+        posted = False
+        try:
+            await channel.send(text, view=view_to_send)
+            posted = True
         except Exception as e:
-            # any unexpected error: log and unlock so the watcher can retry next tick
-            print(f"[wish] fatal draw error gid {gid}: {e}")
+            log.warning("send failed for gid %s in ch %s: %s", gid, ch_id, e)
+
+        if posted:
+            record_giveaway_winners(gid, [uid for uid, _pid in picks], done=True)
+        else:
             with db() as conn:
                 conn.execute("UPDATE giveaways SET status='OPEN' WHERE id=? AND status='DRAWING'", (gid,))
+            schedule_draw(gid, datetime.now(timezone.utc) + timedelta(seconds=DRAW_RETRY_SECS))
+
+    except Exception:
+        # any unexpected error: log, unlock and re-arm a short retry
+        log.exception("fatal draw error gid %s", gid)
+        with db() as conn:
+            conn.execute("UPDATE giveaways SET status='OPEN' WHERE id=? AND status='DRAWING'", (gid,))
+        schedule_draw(gid, datetime.now(timezone.utc) + timedelta(seconds=DRAW_RETRY_SECS))
 
 
 # =========================
 # Optional: Product image helper (unused by default)
 # =========================
 PRODUCT_OG_IMAGE_RX = re.compile(
-    r'<meta[^>]+property=["\']og:image["\'][^>]+content=["\']([^"\']+)["\']', re.I
-)
+    rb'<meta[^>]+property=["\']og:image["\'][^>]+content=["\']([^"\']+)["\']', re.I
+)  # bytes: scanned undecoded, like MANUFACTURER_RX
 async def product_image_url_by_pid(pid: str) -> Optional[str]:
-    timeout = aiohttp.ClientTimeout(total=12, connect=10)
-    async with aiohttp.ClientSession(timeout=timeout, headers=DEFAULT_HEADERS) as s:
-        for url in (
-            f"https://www.imvu.com/shop/product/{pid}",
-            f"https://www.imvu.com/shop/product.php?products_id={pid}",
-        ):
-            html_page = await _fetch_html(url, s, min_len=500)
-            if not html_page:
-                continue
-            m = PRODUCT_OG_IMAGE_RX.search(html_page)
-            if m:
-                return m.group(1)
+    s = http_session()
+    for url in (
+        f"https://www.imvu.com/shop/product/{pid}",
+        f"https://www.imvu.com/shop/product.php?products_id={pid}",
+    ):
+        got = await _fetch_raw(url, s, min_len=500, timeout=SHORT_TIMEOUT, stop_at=b"og:image")
+        if not got:
+            continue
+        m = PRODUCT_OG_IMAGE_RX.search(got[0])
+        if m:
+            return m.group(1).decode("utf-8", errors="ignore")
     return None
 
 # =========================
@@ -1297,11 +1837,22 @@ async def settings_cmd(interaction: discord.Interaction):
     await interaction.response.send_message(
         f"Mode: **{r.get('mode')}** | Threshold: **{r.get('threshold')}**\n"
         f"Min total items: **{r.get('min_total')}**\n"
+        f"Fetch concurrency: **{product_sem().cap}**\n"
         f"MAP: `{r.get('map_json')}`\n"
         f"Creators: {creators_txt}",
         ephemeral=True
     )
 
+@tree.command(name="concurrency", description="Admin: how many IMVU product pages to fetch at once.")
+@app_commands.describe(limit="Parallel product fetches (1-32)")
+async def concurrency_cmd(interaction: discord.Interaction, limit: int):
+    if not interaction.user.guild_permissions.administrator:
+        return await interaction.response.send_message("Admins only.", ephemeral=True)
+    limit = max(1, min(32, int(limit)))
+    set_rule("concurrency", str(limit))
+    await product_sem().resize(limit)
+    await interaction.response.send_message(f"✅ Product fetch concurrency set to **{limit}**.", ephemeral=True)
+
 @tree.command(name="sync", description="Admin: re-register slash commands here.")
 async def sync_cmd(interaction: discord.Interaction):
     if not interaction.user.guild_permissions.administrator:
@@ -1317,29 +1868,22 @@ async def rebind_cmd(interaction: discord.Interaction, giveaway_id: int):
 
     with db() as conn:
         row = conn.execute(
-            "SELECT channel_id, message_id, status FROM giveaways WHERE id=?", (giveaway_id,)
+            "SELECT channel_id, message_id, status, end_at FROM giveaways WHERE id=?", (giveaway_id,)
         ).fetchone()
+        # Allow reopening so we can rebind (same transaction as the read)
+        if row and row[2] != "OPEN":
+            conn.execute("UPDATE giveaways SET status='OPEN' WHERE id=?", (giveaway_id,))
     if not row:
         return await interaction.response.send_message("Unknown giveaway ID.", ephemeral=True)
-    ch_id, msg_id, status = int(row[0]), int(row[1] or 0), row[2]
-    # Allow reopening so we can rebind
-    if status != "OPEN":
-        with db() as conn:
-            conn.execute("UPDATE giveaways SET status='OPEN' WHERE id=?", (giveaway_id,))
-        status = "OPEN"
+    ch_id, msg_id = int(row[0]), int(row[1] or 0)
+    schedule_draw(giveaway_id, _parse_end_at(row[3]))
 
 
-    ch  = bot.get_channel(ch_id) or await bot.fetch_channel(ch_id)
+    ch  = await resolve_channel(ch_id)
     msg = await ch.fetch_message(msg_id)
 
-    # HARD refresh: remove any old components, then attach ONE persistent view
-    view = EnterButton(giveaway_id, disabled=False, timeout=None)
-    try:
-        await msg.edit(view=None)      # <- clears legacy rows/buttons
-    except Exception:
-        pass
-    await msg.edit(view=view)          # <- attaches our new button
-    bot.add_view(view)                 # <- registers same instance for persistence
+    # HARD refresh: view= replaces all old rows/buttons with the stateless button in one edit
+    await msg.edit(view=EnterButton()) # <- routed by message id, no per-giveaway registration
 
     await interaction.response.send_message("✅ Button reattached (hard refresh).", ephemeral=True)
 
@@ -1347,6 +1891,16 @@ async def rebind_cmd(interaction: discord.Interaction, giveaway_id: int):
 # =========================
 # Startup
 # =========================
+def command_tree_hash() -> str:
+    """Stable hash of the registered slash commands' payloads."""
+    payload = []
+    for c in tree.get_commands():
+        try:
+            payload.append(c.to_dict(tree))
+        except TypeError:  # discord.py < 2.4 takes no tree argument
+            payload.append(c.to_dict())
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
 @bot.event
 async def on_interaction(interaction: discord.Interaction):
     ensure_db()  # <<< make sure tables exist before any DB query
@@ -1358,80 +1912,95 @@ async def on_interaction(interaction: discord.Interaction):
     if not cid:
         return
 
+    # "wish:enter_btn" is dispatched by the persistent EnterButton view;
+    # only legacy per-giveaway buttons from older posts are routed here.
     try:
         if cid.startswith("wish:enter:"):
             gid = int(cid.split(":")[-1])
             return await interaction.response.send_modal(EnterModal(gid))
-
-        if cid == "wish:enter_btn":
-            with db() as conn:
-                row = conn.execute(
-                    "SELECT id FROM giveaways WHERE message_id=? LIMIT 1",
-                    (str(interaction.message.id),)
-                ).fetchone()
-            if row:
-                return await interaction.response.send_modal(EnterModal(int(row[0])))
-            else:
-                return await interaction.response.send_message(
-                    "This giveaway button is stale. Ask an admin to rebind.", ephemeral=True
-                )
-    except Exception as e:
-        print(f"[wish] on_interaction fallback error: {e}")
+    except Exception:
+        log.warning("on_interaction fallback error", exc_info=True)
         try:
             await interaction.response.send_message("Something went wrong. Try again.", ephemeral=True)
         except Exception:
             pass
 
 
+def open_posts_and_unlock() -> List[tuple]:
+    """OPEN giveaways with a post to rebind; stuck DRAWING rows reopened in the same transaction."""
+    with db() as conn:
+        rows = conn.execute(
+            "SELECT id, channel_id, message_id FROM giveaways "
+            "WHERE status='OPEN' AND message_id IS NOT NULL AND message_id <> ''"
+        ).fetchall()
+        conn.execute("UPDATE giveaways SET status='OPEN' WHERE status='DRAWING'")
+    return rows
+
+async def sync_commands():
+    # on_ready fires on every reconnect; only hit the sync API when commands changed
+    try:
+        h = command_tree_hash()
+        if get_rule("cmd_hash") != h:
+            await tree.sync(guild=None)
+            set_rule("cmd_hash", h)
+            log.info("Slash commands synced.")
+        else:
+            log.info("Slash commands unchanged; skipping sync.")
+    except Exception as e:
+        log.warning("Slash sync failed: %s", e)
+
 @bot.event
 async def on_ready():
+    # schema + cache purge already ran before bot.run(); this is just the flag check.
+    # The rebind transaction below runs in a worker thread and holds _DB_LOCK while it
+    # does, so an interaction arriving then waits on the loop for that (short) UPDATE.
     ensure_db()
-    print(f"[wish] DB_PATH={DB_PATH}")
+    product_sem()
+    bot.add_view(EnterButton())  # one persistent view for every giveaway post
+    log.info("DB_PATH=%s", DB_PATH)
+    # command sync shares nothing with adopt/rebind; run it alongside them
+    syncing = spawn(sync_commands())
     # try auto-adopt
     try:
         await auto_adopt_open_posts()
     except Exception as e:
-        print("[wish] auto-adopt failed:", e)
+        log.warning("auto-adopt failed: %s", e)
   
     # --- Rebind views to existing OPEN giveaways ---
-    with db() as conn:
-        rows = conn.execute(
-            "SELECT id, channel_id, message_id FROM giveaways "
-            "WHERE status='OPEN' AND message_id IS NOT NULL AND message_id <> ''"
-        ).fetchall()
+    rows = await asyncio.to_thread(open_posts_and_unlock)
 
-    print(f"[wish] rebinding views for {len(rows)} giveaway(s)")
+    log.info("rebinding views for %d giveaway(s)", len(rows))
 
-    for gid, ch_id, msg_id in rows:
+    # one lookup per distinct channel, then every message fetch/edit side by side
+    ch_ids = list({int(r[1]) for r in rows})
+    chans = dict(zip(ch_ids, await asyncio.gather(*(resolve_channel(c) for c in ch_ids), return_exceptions=True)))
+
+    async def rebind_one(gid, ch_id, msg_id):
+        MESSAGE_GIDS[int(msg_id)] = gid
         try:
-            ch  = bot.get_channel(int(ch_id)) or await bot.fetch_channel(int(ch_id))
+            ch = chans[int(ch_id)]
+            if isinstance(ch, BaseException):
+                raise ch
             msg = await ch.fetch_message(int(msg_id))
+            await msg.edit(view=EnterButton())  # swap legacy per-giveaway buttons
 
-            view = EnterButton(gid, disabled=False, timeout=None)  # one instance
-            await msg.edit(view=view)                              # attach to message
-            bot.add_view(view)                                     # register persistent handler
-
-            print(f"[wish] rebound view for giveaway #{gid} (msg {msg_id})")
+            log.info("rebound view for giveaway #%s (msg %s)", gid, msg_id)
         except Exception as e:
-            print(f"[wish] rebind failed for gid {gid}: {e}")
+            log.warning("rebind failed for gid %s: %s", gid, e)
 
-    # --- Unlock any stuck draws and start watcher ---
-    with db() as conn:
-        conn.execute("UPDATE giveaways SET status='OPEN' WHERE status='DRAWING'")
+    await asyncio.gather(*(rebind_one(*r) for r in rows))
 
-    try:
-        await tree.sync(guild=None)
-        for g in bot.guilds:
-            await tree.sync(guild=g)
-        print("Slash commands synced.")
-    except Exception as e:
-        print("Slash sync failed:", e)
+    # --- Start watcher ---
+    schedule_open_draws()
+    await syncing
 
     if not giveaway_watcher.is_running():
         giveaway_watcher.start()
 
-    print(f"Logged in as {bot.user} (ID: {bot.user.id})")
+    log.info("Logged in as %s (ID: %s)", bot.user, bot.user.id)
 
 
 
-bot.run(TOKEN)
+# bootstrap the DB before any interaction can arrive; no event loop is running yet
+ensure_db()
+bot.run(TOKEN, log_handler=None)  # logging is configured above